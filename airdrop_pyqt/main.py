@@ -1,9 +1,26 @@
+import os
 import sys
+import time
+
+START = time.perf_counter()
+
+# python main.py --profile-startup  (or PYDROP_PROFILE_STARTUP=1)
+PROFILE = "--profile-startup" in sys.argv or bool(os.environ.get("PYDROP_PROFILE_STARTUP"))
+
+if PROFILE:
+    # Must be installed before anything else is imported
+    from untils.startup_profile import StartupProfiler
+
+    profiler = StartupProfiler(START)
+    profiler.install()
+
 from PyQt6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
+    if PROFILE:
+        profiler.watch_first_paint(window)
     window.show()
     sys.exit(app.exec())
@@ -4,5 +4,19 @@ class Device:
         self.ip = ip
         self.port = port
 
+        # Every address the peer was discovered on, primary ip first
+        self.addresses = [ip]
+
+    def add_address(self, ip):
+        if ip in self.addresses:
+            return False
+        self.addresses.append(ip)
+        return True
+
+    def set_primary(self, ip):
+        self.ip = ip
+        self.addresses.remove(ip)
+        self.addresses.insert(0, ip)
+
     def __repr__(self):
         return f"{self.name} ({self.ip}:{self.port})"
@@ -1,2 +1,12 @@
 FILE_PORT = 6001
 CHUNK_SIZE = 4096
+
+# Upper bound on bytes kept memory-mapped by the file server's cache
+MAX_MAPPED_BYTES = 512 * 1024 * 1024
+
+# Chat frames on TCP_PORT: messages per acknowledged batch and the
+# largest message accepted, measured after JSON escaping. ChatWindow
+# refuses longer input; the outbox also cuts batches by bytes.
+BATCH_SIZE = 100
+MAX_MESSAGE_BYTES = 128 * 1024
+MAX_FRAME_BYTES = BATCH_SIZE * (MAX_MESSAGE_BYTES + 256)  # + uid / JSON overhead
@@ -1,12 +1,23 @@
 import socket
+import select
+import struct
 import json
 import time
+import uuid
 import platform
 from PyQt6.QtCore import QThread, pyqtSignal
+from network.interfaces import ipv4_addresses, ipv6_interfaces
+from network.routing import peer_address
 
 MCAST_GROUP = "224.1.1.1"
+MCAST6_GROUP = "ff02::7064"  # link-local scope
 MCAST_PORT = 50000
+
+# Beacon every INTERVAL seconds while things change, backing off to
+# MAX_INTERVAL once every peer address is known
 INTERVAL = 2
+MAX_INTERVAL = 8
+RESCAN_INTERVAL = 30  # re-enumerate interfaces (VPN up, new Docker bridge…)
 
 
 class DiscoveryThread(QThread):
@@ -15,48 +26,158 @@ class DiscoveryThread(QThread):
     def __init__(self, username):
         super().__init__()
         self.username = username
+        self.device_id = uuid.uuid4().hex
         self.running = True
 
-    def run(self):
-        recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        recv_sock.bind(("", MCAST_PORT))
+        self.ipv4 = []  # local addresses joined / sent from
+        self.ipv6 = []  # (index, name) of interfaces joined / sent on
+        self.known = set()  # (peer id, address) already reported
+
+    # -------------------------
+    # Sockets
+    # -------------------------
+    def open_ipv4(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        sock.bind(("", MCAST_PORT))
+        return sock
+
+    def open_ipv6(self):
+        try:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            sock.bind(("", MCAST_PORT))
+            return sock
+        except (OSError, AttributeError) as e:
+            print("IPv6 discovery unavailable:", e)
+            return None
+
+    def join_interfaces(self, sock4, sock6):
+        """Join the groups on any new interface; True if the set changed."""
+        ipv4 = ipv4_addresses() or ["0.0.0.0"]
+        ipv6 = ipv6_interfaces() if sock6 else []
+        changed = not set(self.ipv4) <= set(ipv4) or not set(self.ipv6) <= set(ipv6)
+
+        # Only joined addresses are kept; failed ones are retried next scan
+        joined4 = []
+        for addr in ipv4:
+            if addr in self.ipv4:
+                joined4.append(addr)
+                continue
+            try:
+                mreq = socket.inet_aton(MCAST_GROUP) + socket.inet_aton(addr)
+                sock4.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+                joined4.append(addr)
+                changed = True
+            except OSError as e:
+                # Same interface joined via another address, or no multicast
+                print("Discovery join failed on", addr, e)
+
+        joined6 = []
+        for index, name in ipv6:
+            if (index, name) in self.ipv6:
+                joined6.append((index, name))
+                continue
+            try:
+                mreq = socket.inet_pton(socket.AF_INET6, MCAST6_GROUP) + struct.pack("@I", index)
+                sock6.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_JOIN_GROUP, mreq)
+                joined6.append((index, name))
+                changed = True
+            except OSError:
+                pass  # interface has no IPv6
+
+        self.ipv4 = joined4
+        self.ipv6 = joined6
+        return changed
+
+    # -------------------------
+    # Beacons
+    # -------------------------
+    def send_beacons(self, sock4, sock6, payload):
+        for addr in self.ipv4:
+            try:
+                sock4.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(addr))
+                sock4.sendto(payload, (MCAST_GROUP, MCAST_PORT))
+            except OSError as e:
+                print("Discovery send failed on", addr, e)
 
-        mreq = socket.inet_aton(MCAST_GROUP) + socket.inet_aton("0.0.0.0")
-        recv_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-        recv_sock.settimeout(1)
+        for index, name in self.ipv6:
+            try:
+                sock6.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, index)
+                sock6.sendto(payload, (MCAST6_GROUP, MCAST_PORT, 0, index))
+            except OSError as e:
+                print("Discovery send failed on", name, e)
+
+    def receive(self, sock):
+        """Handle one beacon; True if it revealed a new peer address."""
+        data, addr = sock.recvfrom(1024)
+
+        # Anyone on the LAN can hit this port; ignore what isn't a beacon
+        try:
+            info = json.loads(data.decode())
+        except ValueError:  # includes UnicodeDecodeError
+            return False
+        if not isinstance(info, dict) or not isinstance(info.get("name"), str):
+            return False
+
+        if info.get("id", info["name"]) == self.device_id or info["name"] == self.username:
+            return False
+
+        ip = peer_address(addr)
+        info["ip"] = ip
+        self.device_found.emit(info)
+
+        key = (info.get("id", info["name"]), ip)
+        if key in self.known:
+            return False
+        self.known.add(key)
+        return True
 
-        send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+    def run(self):
+        sock4 = self.open_ipv4()
+        sock6 = self.open_ipv6()
+        sockets = [s for s in (sock4, sock6) if s]
 
         payload = json.dumps({
             "name": self.username,
+            "id": self.device_id,
             "port": 6000,
             "os": platform.system()
         }).encode()
 
+        interval = INTERVAL
+        next_beacon = 0
+        next_scan = 0
+
         while self.running:
             try:
-                send_sock.sendto(payload, (MCAST_GROUP, MCAST_PORT))
-
-                try:
-                    data, addr = recv_sock.recvfrom(1024)
-                    info = json.loads(data.decode())
+                now = time.monotonic()
 
-                    if info["name"] != self.username:
-                        info["ip"] = addr[0]
-                        self.device_found.emit(info)
+                if now >= next_scan:
+                    if self.join_interfaces(sock4, sock6):
+                        interval = INTERVAL
+                    next_scan = now + RESCAN_INTERVAL
 
-                except socket.timeout:
-                    pass
+                if now >= next_beacon:
+                    self.send_beacons(sock4, sock6, payload)
+                    next_beacon = now + interval
+                    interval = min(interval * 2, MAX_INTERVAL)
 
-                time.sleep(INTERVAL)
+                ready, _, _ = select.select(sockets, [], [], min(1, max(next_beacon - now, 0)))
+                for sock in ready:
+                    if self.receive(sock):
+                        # Answer a newcomer right away so it sees us too
+                        interval = INTERVAL
+                        next_beacon = 0
 
             except Exception as e:
                 print("Discovery error:", e)
+                time.sleep(1)
 
-        recv_sock.close()
-        send_sock.close()
+        for sock in sockets:
+            sock.close()
 
     def stop(self):
         self.running = False
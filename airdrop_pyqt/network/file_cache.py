@@ -0,0 +1,119 @@
+import mmap
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from network.constants import MAX_MAPPED_BYTES
+
+
+class _MappedFile:
+    def __init__(self, path):
+        st = path.stat()
+        self.size = st.st_size
+        self.mtime = st.st_mtime_ns
+        self.file = None
+        self.map = None
+
+        # Sends currently reading the map, and whether the cache let go of it
+        self.users = 0
+        self.dropped = False
+
+        # mmap refuses empty files, those are served as b""
+        if self.size:
+            self.file = open(path, "rb")
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def is_stale(self, path):
+        st = path.stat()
+        return st.st_size != self.size or st.st_mtime_ns != self.mtime
+
+    def close(self):
+        # Runs once both the cache and the last sender are done with it
+        if self.map is not None:
+            self.map.close()
+        if self.file is not None:
+            self.file.close()
+
+
+class FileCache:
+    """Keeps hot shared files open and memory-mapped, LRU-capped on mapped bytes."""
+
+    def __init__(self, max_bytes=MAX_MAPPED_BYTES):
+        self.max_bytes = max_bytes
+        self.mapped_bytes = 0
+        self.entries = OrderedDict()  # Path -> _MappedFile
+        self.lock = threading.Lock()
+
+    def _get(self, path):
+        entry = self.entries.get(path)
+
+        if entry is not None:
+            try:
+                stale = entry.is_stale(path)
+            except OSError:
+                # Deleted or unreadable: unmap so its space can be freed
+                self._drop(path)
+                raise
+
+            if not stale:
+                self.entries.move_to_end(path)
+                return entry
+            self._drop(path)
+
+        entry = _MappedFile(path)
+        self.entries[path] = entry
+        self.mapped_bytes += entry.size
+        self._evict(keep=path)
+        return entry
+
+    def _evict(self, keep):
+        # Oldest first; a file bigger than the cap still gets served on its own
+        while self.mapped_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            if oldest == keep:
+                break
+            self._drop(oldest)
+
+    def _drop(self, path):
+        # An entry still being sent leaves the cache now, unmaps when released
+        entry = self.entries.pop(path)
+        self.mapped_bytes -= entry.size
+        entry.dropped = True
+        if not entry.users:
+            entry.close()
+
+    def _release(self, entry):
+        with self.lock:
+            entry.users -= 1
+            if entry.dropped and not entry.users:
+                entry.close()
+
+    @contextmanager
+    def view(self, path):
+        """Yield a memoryview over the current contents of path."""
+        # The lock covers lookup only; sends to different peers run in parallel
+        with self.lock:
+            entry = self._get(path)
+            entry.users += 1
+
+        try:
+            if entry.map is None:
+                yield memoryview(b"")
+                return
+
+            view = memoryview(entry.map)
+            try:
+                yield view
+            finally:
+                view.release()
+        finally:
+            self._release(entry)
+
+    def invalidate(self, path):
+        with self.lock:
+            if path in self.entries:
+                self._drop(path)
+
+    def clear(self):
+        with self.lock:
+            for path in list(self.entries):
+                self._drop(path)
@@ -1,41 +1,28 @@
-import socket
-import json
 from PyQt6.QtCore import QThread
 from network.constants import FILE_PORT, CHUNK_SIZE
-
-
-def recv_exact(conn, size):
-    data = b""
-    while len(data) < size:
-        part = conn.recv(size - len(data))
-        if not part:
-            raise ConnectionError("Connection closed")
-        data += part
-    return data
+from network.routing import connect_fastest
+from network.protocol import send_frame, recv_frame
 
 
 class FileSender(QThread):
-    def __init__(self, ip, filename, save_path):
+    def __init__(self, addresses, filename, save_path):
         super().__init__()
-        self.ip = ip
+        self.addresses = addresses
         self.filename = filename
         self.save_path = save_path
 
     def run(self):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((self.ip, FILE_PORT))
+        # Use the peer address with the lowest connect RTT
+        sock = connect_fastest(self.addresses, FILE_PORT)
+        sock.settimeout(None)
 
         # Request file
-        request = json.dumps({
+        send_frame(sock, {
             "request": self.filename
-        }).encode()
-
-        sock.sendall(len(request).to_bytes(4, "big"))
-        sock.sendall(request)
+        })
 
         # Receive metadata
-        meta_len = int.from_bytes(recv_exact(sock, 4), "big")
-        meta = json.loads(recv_exact(sock, meta_len).decode())
+        meta = recv_frame(sock)
         filesize = meta["filesize"]
 
         received = 0
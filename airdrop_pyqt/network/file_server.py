@@ -1,18 +1,13 @@
-import socket
-import json
+import threading
 from pathlib import Path
 from PyQt6.QtCore import QThread
-from network.constants import FILE_PORT, CHUNK_SIZE
+from network.constants import FILE_PORT
+from network.file_cache import FileCache
+from network.routing import create_server
+from network.protocol import send_frame, recv_frame
 
-
-def recv_exact(conn, size):
-    data = b""
-    while len(data) < size:
-        chunk = conn.recv(size - len(data))
-        if not chunk:
-            raise ConnectionError("Connection closed")
-        data += chunk
-    return data
+# A request is just a filename and an optional range
+MAX_REQUEST_BYTES = 4096
 
 
 class FileServer(QThread):
@@ -23,57 +18,81 @@ class FileServer(QThread):
         # Files that THIS device can serve
         self.shared_files = {}  # filename -> Path
 
+        # Hot files stay mapped so repeated downloads skip the disk
+        self.cache = FileCache()
+
     def add_file(self, path: Path):
+        path = path.resolve()
+        old = self.shared_files.get(path.name)
+        if old is not None and old != path:
+            self.cache.invalidate(old)
         self.shared_files[path.name] = path
 
     def run(self):
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server.bind(("0.0.0.0", FILE_PORT))
-        server.listen(5)
+        server = create_server(FILE_PORT)
 
         print("📂 File server listening on port", FILE_PORT)
 
         while self.running:
             try:
                 conn, addr = server.accept()
-                print("📥 Incoming file request from", addr)
+            except Exception as e:
+                if self.running:
+                    print("❌ File server error:", e)
+                continue
+
+            # One thread per download so a slow peer doesn't hold up the rest
+            threading.Thread(
+                target=self.handle_request, args=(conn, addr), daemon=True
+            ).start()
+
+        server.close()
+        self.cache.clear()
 
-                # ---- receive request ----
-                req_len = int.from_bytes(recv_exact(conn, 4), "big")
-                request = json.loads(recv_exact(conn, req_len).decode())
+    def handle_request(self, conn, addr):
+        try:
+            print("📥 Incoming file request from", addr)
 
-                filename = request.get("request")
-                if not filename or filename not in self.shared_files:
-                    print("❌ Requested file not found:", filename)
-                    conn.close()
-                    continue
+            # ---- receive request ----
+            request = recv_frame(conn, MAX_REQUEST_BYTES)
 
-                path = self.shared_files[filename]
-                filesize = path.stat().st_size
+            filename = request.get("request")
+            if not filename or filename not in self.shared_files:
+                print("❌ Requested file not found:", filename)
+                return
+
+            path = self.shared_files[filename]
+
+            with self.cache.view(path) as view:
+                # Optional byte range, whole file by default
+                offset = min(max(int(request.get("offset", 0)), 0), len(view))
+                length = request.get("length")
+                end = len(view) if length is None else min(offset + max(int(length), 0), len(view))
 
                 # ---- send metadata ----
-                meta = json.dumps({
+                send_frame(conn, {
                     "filename": filename,
-                    "filesize": filesize
-                }).encode()
-
-                conn.sendall(len(meta).to_bytes(4, "big"))
-                conn.sendall(meta)
+                    "filesize": end - offset,
+                    "offset": offset,
+                    "total": len(view)
+                })
 
                 # ---- send file ----
-                with open(path, "rb") as f:
-                    while chunk := f.read(CHUNK_SIZE):
-                        conn.sendall(chunk)
+                conn.sendall(view[offset:end])
 
-                print("✅ File sent:", filename)
-                conn.close()
+            print("✅ File sent:", filename)
 
-            except Exception as e:
-                if self.running:
-                    print("❌ File server error:", e)
+        except ConnectionError:
+            # Downloaders race a connect to each of our addresses
+            # and close the ones that lose
+            pass
 
-        server.close()
+        except Exception as e:
+            if self.running:
+                print("❌ File server error:", e)
+
+        finally:
+            conn.close()
 
     def stop(self):
         self.running = False
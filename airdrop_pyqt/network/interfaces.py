@@ -0,0 +1,78 @@
+import socket
+import struct
+import sys
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl that returns an interface's IPv4 address (struct ifreq, addr at 20:24)
+SIOCGIFADDR = {"linux": 0x8915, "darwin": 0xc0206921}.get(sys.platform)
+
+LOOPBACK_NAMES = ("lo", "lo0")
+
+
+def _interface_names():
+    try:
+        return [(index, name) for index, name in socket.if_nameindex()]
+    except (AttributeError, OSError):
+        return []
+
+
+def _ioctl_ipv4(name):
+    if fcntl is None or SIOCGIFADDR is None:
+        return None
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        ifreq = struct.pack("256s", name[:15].encode())
+        return socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, ifreq)[20:24])
+    except OSError:
+        return None  # no IPv4 address on this interface
+    finally:
+        sock.close()
+
+
+def _default_route_ipv4():
+    # connect() on UDP only picks a route, nothing is sent
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect(("10.255.255.255", 1))
+        return sock.getsockname()[0]
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+def ipv4_addresses():
+    """Every non-loopback IPv4 address of this machine."""
+    found = []
+
+    for _, name in _interface_names():
+        addr = _ioctl_ipv4(name)
+        if addr:
+            found.append(addr)
+
+    try:
+        for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET):
+            found.append(info[4][0])
+    except OSError:
+        pass
+
+    found.append(_default_route_ipv4())
+
+    addresses = []
+    for addr in found:
+        if addr and not addr.startswith("127.") and addr not in addresses:
+            addresses.append(addr)
+    return addresses
+
+
+def ipv6_interfaces():
+    """(index, name) of every non-loopback interface, for link-local multicast."""
+    return [
+        (index, name) for index, name in _interface_names()
+        if name not in LOOPBACK_NAMES
+    ]
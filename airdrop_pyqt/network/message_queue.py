@@ -0,0 +1,185 @@
+import threading
+import time
+from PyQt6.QtCore import QThread, pyqtSignal
+from network.constants import BATCH_SIZE, MAX_MESSAGE_BYTES, MAX_FRAME_BYTES
+from network.protocol import encoded_size
+from network.tcp_client import PeerConnection, entry_size, SEND_TIMEOUT
+from storage.chat_db import ChatDB
+
+FLUSH_INTERVAL = 1.0    # min seconds between connections to the same peer
+RETRY_BASE = 2.0        # first retry delay after a failed flush
+RETRY_MAX = 60.0
+
+# Sends to a reachable peer that didn't get acked; then the row is failed.
+# Offline peers never connect, so their messages wait indefinitely.
+MAX_ATTEMPTS = 5
+
+# Beacons arrive every 2-8 s; a longer silence means the peer was gone
+PEER_GONE = 30.0
+
+
+class MessageQueue(QThread):
+    """
+    Delivers messages stored in the SQLite outbox.
+
+    Each flush sends everything queued for a peer over one connection,
+    in acknowledged batches. Failed peers back off until discovery sees
+    them come back after their beacons stopped.
+    """
+
+    delivery_changed = pyqtSignal(str)  # peer ip whose outbox rows changed
+
+    def __init__(self, is_shared):
+        super().__init__()
+        self.running = True
+        self.is_shared = is_shared  # filename -> still served by FileServer?
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.next_flush = {}  # ip -> earliest time we may connect again
+        self.failures = {}    # ip -> consecutive failed flushes
+        self.addresses = {}   # ip -> every address the peer was seen on
+        self.last_seen = {}   # ip -> time of the peer's latest beacon
+        self.conn = None      # connection being flushed, for stop()
+
+    # -------------------------
+    # Called from the UI thread
+    # -------------------------
+    def flush(self):
+        # New messages queued; they go out once the peer's rate limit allows
+        self.wake.set()
+
+    def peer_seen(self, ip, addresses):
+        # Called on every beacon. Only a peer that returns after going
+        # quiet has its backoff dropped; the rate limit still applies.
+        now = time.monotonic()
+        with self.lock:
+            self.addresses[ip] = list(addresses)
+            last = self.last_seen.get(ip)
+            self.last_seen[ip] = now
+            if ip not in self.failures or (last is not None and now - last < PEER_GONE):
+                return
+            self.failures.pop(ip)
+            self.next_flush[ip] = min(
+                self.next_flush.get(ip, 0), now + FLUSH_INTERVAL
+            )
+        self.wake.set()
+
+    # -------------------------
+    # Worker
+    # -------------------------
+    def run(self):
+        db = ChatDB()
+
+        while self.running:
+            self.wake.clear()
+            now = time.monotonic()
+            wait = RETRY_MAX
+
+            for ip in db.pending_peers():
+                with self.lock:
+                    due = self.next_flush.get(ip, 0)
+
+                if due > now:
+                    wait = min(wait, due - now)
+                    continue
+
+                self.flush_peer(db, ip)
+                wait = min(wait, FLUSH_INTERVAL)
+
+            self.wake.wait(wait)
+
+        db.conn.close()
+
+    def flush_peer(self, db, ip):
+        # Shared files only live for one run; after a restart a queued
+        # announcement would hand out a dead download link
+        stale = [uid for uid, filename in db.queued_files(ip) if not self.is_shared(filename)]
+        if stale:
+            print("Dropping announcements of files no longer shared:", len(stale))
+            db.discard_messages(stale)
+            self.delivery_changed.emit(ip)
+            if not db.pending_messages(ip, 1):
+                return
+
+        if db.fail_exhausted(ip, MAX_ATTEMPTS):
+            self.delivery_changed.emit(ip)
+
+        conn = None
+        try:
+            with self.lock:
+                addresses = self.addresses.get(ip, [ip])
+            conn = PeerConnection(addresses, cancelled=lambda: not self.running)
+            self.conn = conn
+            if not self.running:
+                return
+            while self.running:
+                rows = db.pending_messages(ip, BATCH_SIZE)
+                if not rows:
+                    break
+
+                batch = self.take_batch(db, ip, rows)
+                if not batch:
+                    continue
+
+                db.record_attempt([uid for uid, _ in batch])
+                acked = conn.send_batch(batch)
+                db.mark_delivered(acked)
+                self.delivery_changed.emit(ip)
+
+                if len(acked) < len(batch):
+                    raise ConnectionError("Peer did not acknowledge every message")
+
+            with self.lock:
+                self.failures.pop(ip, None)
+                self.next_flush[ip] = time.monotonic() + FLUSH_INTERVAL
+
+        except Exception as e:
+            print("Send failed, queued for retry:", ip, e)
+            with self.lock:
+                failures = self.failures.get(ip, 0) + 1
+                self.failures[ip] = failures
+                delay = min(RETRY_BASE * 2 ** (failures - 1), RETRY_MAX)
+                self.next_flush[ip] = time.monotonic() + delay
+
+        finally:
+            self.conn = None
+            if conn is not None:
+                conn.close()
+
+    def take_batch(self, db, ip, rows):
+        """Leading rows that fit in one frame; oversized rows are failed."""
+        budget = MAX_FRAME_BYTES - encoded_size({"messages": []})
+        batch = []
+        oversized = []
+
+        for uid, text in rows:
+            if encoded_size(text) > MAX_MESSAGE_BYTES:
+                # The receiver would reject every frame carrying it
+                oversized.append(uid)
+                continue
+
+            size = entry_size(uid, text)
+            if size > budget:
+                break
+            batch.append((uid, text))
+            budget -= size
+
+        if oversized:
+            db.mark_failed(oversized)
+            self.delivery_changed.emit(ip)
+        return batch
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+        conn = self.conn
+        if conn is not None:
+            conn.abort()
+
+    def shutdown(self):
+        # Never let Qt destroy the thread while it is still running
+        self.stop()
+        if not self.wait((SEND_TIMEOUT + 1) * 1000):
+            self.terminate()
+            self.wait()
@@ -0,0 +1,35 @@
+import json
+from network.constants import MAX_FRAME_BYTES
+
+
+def recv_exact(conn, size):
+    data = b""
+    while len(data) < size:
+        part = conn.recv(size - len(data))
+        if not part:
+            raise ConnectionError("Connection closed")
+        data += part
+    return data
+
+
+def encode(obj):
+    # Keep non-ASCII text at its UTF-8 size, frames are capped in bytes
+    return json.dumps(obj, ensure_ascii=False).encode()
+
+
+def encoded_size(obj):
+    # Size on the wire, after JSON escaping (control chars grow 6x)
+    return len(encode(obj))
+
+
+def send_frame(conn, obj):
+    data = encode(obj)
+    conn.sendall(len(data).to_bytes(4, "big") + data)
+
+
+def recv_frame(conn, max_size=MAX_FRAME_BYTES):
+    size = int.from_bytes(recv_exact(conn, 4), "big")
+    if size > max_size:
+        # The length comes from any host on the LAN, don't allocate it
+        raise ValueError(f"Frame too large ({size} bytes)")
+    return json.loads(recv_exact(conn, size).decode())
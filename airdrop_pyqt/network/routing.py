@@ -0,0 +1,140 @@
+import errno
+import ipaddress
+import selectors
+import socket
+import time
+
+# connect_ex results meaning "still connecting" on a non-blocking socket
+CONNECT_PENDING = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+
+PRIVATE_LANS = [
+    ipaddress.ip_network("192.168.0.0/16"),
+    ipaddress.ip_network("10.0.0.0/8"),
+    ipaddress.ip_network("172.16.0.0/12"),
+]
+
+
+def create_server(port):
+    """Listen on IPv4 and IPv6 when the platform allows it."""
+    if socket.has_dualstack_ipv6():
+        server = socket.create_server(
+            ("", port), family=socket.AF_INET6, dualstack_ipv6=True
+        )
+    else:
+        server = socket.create_server(("0.0.0.0", port))
+    return server
+
+
+def peer_address(addr):
+    """
+    Connectable address string for a sockaddr from recvfrom/accept.
+    Discovery and the servers must agree on it, it keys MainWindow.devices.
+    """
+    ip = addr[0]
+
+    # Dual-stack sockets report IPv4 peers as ::ffff:a.b.c.d
+    if ip.startswith("::ffff:") and "." in ip:
+        return ip[len("::ffff:"):]
+
+    # Link-local IPv6 needs its scope (interface index) to be reachable
+    if len(addr) == 4 and addr[3] and "%" not in ip:
+        return f"{ip}%{addr[3]}"
+    return ip
+
+
+def address_preference(ip):
+    """
+    Sort key for choosing a peer's primary address, independent of the
+    order beacons arrive in: private IPv4, other IPv4, global IPv6, then
+    link-local (which depends on our interface numbering).
+    """
+    try:
+        addr = ipaddress.ip_address(ip.split("%")[0])
+    except ValueError:
+        return (4, 0, ip)
+
+    if addr.is_link_local:
+        return (3, 0, ip)
+    if addr.version == 6:
+        return (2, 0, ip)
+    if not addr.is_private:
+        return (1, 0, ip)
+
+    # Home/office LANs first; 172.16/12 is where Docker puts its bridges
+    for sub, net in enumerate(PRIVATE_LANS):
+        if addr in net:
+            return (0, sub, ip)
+    return (0, len(PRIVATE_LANS), ip)
+
+
+def connect_fastest(addresses, port, timeout=5, cancelled=None):
+    """
+    Race a TCP connect to every address of a peer and keep the first one
+    to complete, i.e. the path with the lowest RTT. The rest are closed.
+    cancelled() is polled while waiting so a shutdown can abort the race.
+    """
+    sel = selectors.DefaultSelector()
+    pending = []
+    last_error = None
+    start = time.monotonic()
+
+    for addr in dict.fromkeys(addresses):
+        try:
+            family, type_, proto, _, sockaddr = socket.getaddrinfo(
+                addr, port, type=socket.SOCK_STREAM
+            )[0]
+            sock = socket.socket(family, type_, proto)
+        except OSError as e:
+            last_error = e
+            continue
+
+        sock.setblocking(False)
+        err = sock.connect_ex(sockaddr)
+        if err not in CONNECT_PENDING:
+            # Failed on the spot (no route, bad scope…): not a candidate
+            last_error = OSError(err, f"connect to {addr} failed")
+            sock.close()
+            continue
+
+        sel.register(sock, selectors.EVENT_WRITE, addr)
+        pending.append(sock)
+
+    winner = None
+    deadline = start + timeout
+
+    try:
+        while winner is None and sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (cancelled and cancelled()):
+                break
+
+            for key, _ in sel.select(min(remaining, 0.2) if cancelled else remaining):
+                sock = key.fileobj
+                sel.unregister(sock)
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err:
+                    last_error = OSError(err, f"connect to {key.data} failed")
+                    continue
+
+                try:
+                    sock.getpeername()
+                except OSError as e:
+                    # Writable but never connected
+                    last_error = e
+                    continue
+
+                winner = sock
+                print(f"Using {key.data} ({(time.monotonic() - start) * 1000:.1f} ms)")
+                break
+    finally:
+        sel.close()
+        for sock in pending:
+            if sock is not winner:
+                sock.close()
+
+    if winner is None:
+        raise last_error or TimeoutError(f"No route to {', '.join(addresses)}")
+
+    winner.setblocking(True)
+    winner.settimeout(timeout)
+    return winner
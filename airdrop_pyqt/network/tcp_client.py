@@ -1,21 +1,41 @@
 import socket
-from PyQt6.QtCore import QThread
+from network.protocol import send_frame, recv_frame, encoded_size
+from network.routing import connect_fastest
 
 TCP_PORT = 6000
+SEND_TIMEOUT = 5  # seconds, for connecting and for each ack
 
 
-class SendMessageThread(QThread):
-    def __init__(self, ip, message):
-        super().__init__()
-        self.ip = ip
-        self.message = message
+def batch_entry(uid, text):
+    return {"uid": uid, "text": text}
 
-    def run(self):
+
+def entry_size(uid, text):
+    # Bytes the entry adds to a batch frame, separator included
+    return encoded_size(batch_entry(uid, text)) + 2
+
+
+class PeerConnection:
+    """One TCP connection carrying any number of acknowledged message batches."""
+
+    def __init__(self, addresses, timeout=SEND_TIMEOUT, cancelled=None):
+        # Goes over whichever of the peer's addresses answers first
+        self.sock = connect_fastest(addresses, TCP_PORT, timeout, cancelled)
+
+    def send_batch(self, batch):
+        # batch: list of (uid, text); returns the uids the receiver acked
+        send_frame(self.sock, {
+            "messages": [batch_entry(uid, text) for uid, text in batch]
+        })
+        reply = recv_frame(self.sock)
+        return reply.get("ack", [])
+
+    def abort(self):
+        # From another thread: wakes up a send/recv blocked on this socket
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(3)
-            sock.connect((self.ip, TCP_PORT))
-            sock.sendall(self.message.encode())
-            sock.close()
-        except Exception as e:
-            print("Send failed:", e)
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        self.sock.close()
@@ -1,8 +1,14 @@
 import socket
+from collections import OrderedDict
 from PyQt6.QtCore import QThread, pyqtSignal
+from network.protocol import send_frame, recv_frame
+from network.routing import create_server, peer_address
 
 TCP_PORT = 6000
 
+# Remember this many delivered uids so re-sent batches aren't shown twice
+SEEN_LIMIT = 10000
+
 
 class TCPServer(QThread):
     message_received = pyqtSignal(str, str)  # ip, message
@@ -10,12 +16,10 @@ class TCPServer(QThread):
     def __init__(self):
         super().__init__()
         self.running = True
+        self.seen = OrderedDict()  # uid -> None
 
     def run(self):
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server.bind(("0.0.0.0", TCP_PORT))
-        server.listen(5)
+        server = create_server(TCP_PORT)
         server.settimeout(1)
 
         print("TCP server listening on port", TCP_PORT)
@@ -24,9 +28,10 @@ class TCPServer(QThread):
             try:
                 conn, addr = server.accept()
                 try:
-                    data = conn.recv(4096).decode()
-                    if data:
-                        self.message_received.emit(addr[0], data)
+                    conn.settimeout(5)
+                    self.handle_connection(conn, peer_address(addr))
+                except ConnectionError:
+                    pass
                 except Exception as e:
                     print("Receive error:", e)
                 finally:
@@ -40,5 +45,27 @@ class TCPServer(QThread):
         server.close()
         print("TCP server stopped")
 
+    def handle_connection(self, conn, ip):
+        # The sender keeps the connection open for several batches
+        while self.running:
+            batch = recv_frame(conn)
+            acked = []
+
+            for msg in batch.get("messages", []):
+                uid = msg.get("uid")
+                text = msg.get("text")
+                if not uid or text is None:
+                    continue
+
+                if uid not in self.seen:
+                    self.seen[uid] = None
+                    if len(self.seen) > SEEN_LIMIT:
+                        self.seen.popitem(last=False)
+                    self.message_received.emit(ip, text)
+
+                acked.append(uid)
+
+            send_frame(conn, {"ack": acked})
+
     def stop(self):
         self.running = False
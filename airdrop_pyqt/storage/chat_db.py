@@ -1,5 +1,6 @@
 import sqlite3
 import time
+import uuid
 from storage.app_paths import get_app_data_dir
 
 DB_NAME = "chat.db"
@@ -11,6 +12,8 @@ class ChatDB:
         db_path = app_dir / DB_NAME
 
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # The outbox thread uses its own connection alongside the UI's
+        self.conn.execute("PRAGMA journal_mode=WAL")
         self.create_table()
 
     def create_table(self):
@@ -23,18 +26,126 @@ class ChatDB:
                 timestamp REAL
             )
         """)
+        # Messages not yet acked by the peer. state is 'queued' while we
+        # keep retrying and 'failed' once the peer kept rejecting it;
+        # acked rows are deleted, so delivered == no outbox row.
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT UNIQUE,
+                peer_ip TEXT,
+                payload TEXT,
+                state TEXT,
+                attempts INTEGER DEFAULT 0,
+                created REAL,
+                last_attempt REAL,
+                message_id INTEGER,
+                filename TEXT
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, peer_ip)"
+        )
         self.conn.commit()
 
     def save_message(self, peer_ip, direction, message):
-        self.conn.execute(
+        cursor = self.conn.execute(
             "INSERT INTO messages (peer_ip, direction, message, timestamp) VALUES (?, ?, ?, ?)",
             (peer_ip, direction, message, time.time())
         )
         self.conn.commit()
+        return cursor.lastrowid
 
     def load_messages(self, peer_ip):
+        # uid is set while the message is still in the outbox
+        cursor = self.conn.execute(
+            """SELECT m.direction, m.message, o.uid FROM messages m
+               LEFT JOIN outbox o ON o.message_id = m.id
+               WHERE m.peer_ip=? ORDER BY m.id""",
+            (peer_ip,)
+        )
+        return cursor.fetchall()
+
+    def has_history(self, peer_ip):
+        cursor = self.conn.execute(
+            """SELECT 1 FROM messages WHERE peer_ip=?
+               UNION ALL SELECT 1 FROM outbox WHERE peer_ip=? LIMIT 1""",
+            (peer_ip, peer_ip)
+        )
+        return cursor.fetchone() is not None
+
+    # -------------------------
+    # Outbox (store-and-forward)
+    # -------------------------
+    def enqueue_message(self, peer_ip, payload, message_id=None, filename=None):
+        # filename marks a file announcement, only valid while it's shared
+        uid = uuid.uuid4().hex
+        self.conn.execute(
+            """INSERT INTO outbox (uid, peer_ip, payload, state, created, message_id, filename)
+               VALUES (?, ?, ?, 'queued', ?, ?, ?)""",
+            (uid, peer_ip, payload, time.time(), message_id, filename)
+        )
+        self.conn.commit()
+        return uid
+
+    def pending_peers(self):
+        cursor = self.conn.execute(
+            "SELECT DISTINCT peer_ip FROM outbox WHERE state='queued'"
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def pending_messages(self, peer_ip, limit):
+        cursor = self.conn.execute(
+            "SELECT uid, payload FROM outbox WHERE peer_ip=? AND state='queued' ORDER BY id LIMIT ?",
+            (peer_ip, limit)
+        )
+        return cursor.fetchall()
+
+    def delivery_states(self, peer_ip):
+        # uid -> 'queued' / 'failed'; uids not listed were delivered
+        cursor = self.conn.execute(
+            "SELECT uid, state FROM outbox WHERE peer_ip=?",
+            (peer_ip,)
+        )
+        return dict(cursor.fetchall())
+
+    def queued_files(self, peer_ip):
         cursor = self.conn.execute(
-            "SELECT direction, message FROM messages WHERE peer_ip=? ORDER BY id",
+            "SELECT uid, filename FROM outbox WHERE peer_ip=? AND state='queued' AND filename IS NOT NULL",
             (peer_ip,)
         )
         return cursor.fetchall()
+
+    def record_attempt(self, uids):
+        self.conn.executemany(
+            "UPDATE outbox SET attempts = attempts + 1, last_attempt=? WHERE uid=?",
+            [(time.time(), uid) for uid in uids]
+        )
+        self.conn.commit()
+
+    def mark_failed(self, uids):
+        self.conn.executemany(
+            "UPDATE outbox SET state='failed' WHERE uid=?",
+            [(uid,) for uid in uids]
+        )
+        self.conn.commit()
+
+    def fail_exhausted(self, peer_ip, max_attempts):
+        # Rows the peer kept rejecting stop blocking the rest of its queue
+        cursor = self.conn.execute(
+            "UPDATE outbox SET state='failed' WHERE peer_ip=? AND state='queued' AND attempts >= ?",
+            (peer_ip, max_attempts)
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def mark_delivered(self, uids):
+        # Acked rows have nothing left to do; the text stays in messages
+        self.discard_messages(uids)
+
+    def discard_messages(self, uids):
+        self.conn.executemany(
+            "DELETE FROM outbox WHERE uid=?",
+            [(uid,) for uid in uids]
+        )
+        self.conn.commit()
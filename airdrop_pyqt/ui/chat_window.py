@@ -3,12 +3,13 @@ from pathlib import Path
 
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QTextBrowser,
-    QLineEdit, QPushButton, QFileDialog
+    QLineEdit, QPushButton, QFileDialog, QMessageBox
 )
 from PyQt6.QtCore import Qt
 
-from network.tcp_client import SendMessageThread
+from network.constants import MAX_MESSAGE_BYTES
 from network.file_sender import FileSender
+from network.protocol import encoded_size
 from storage.chat_db import ChatDB
 
 
@@ -20,10 +21,13 @@ class ChatWindow(QWidget):
 
         self.db = ChatDB()
 
-        self.send_threads = []
         self.file_threads = []
         self.pending_files = {}  # filename -> Path (sender side)
 
+        # Everything drawn, so bubbles can be redrawn when delivery changes
+        self.bubbles = []  # (kind, content, sent, outbox uid)
+        self.states = {}   # outbox uid -> 'queued' / 'failed'
+
         self.setWindowTitle(f"Chat – {device.name}")
         self.setMinimumSize(480, 560)
 
@@ -66,9 +70,20 @@ class ChatWindow(QWidget):
     # History
     # -------------------------
     def load_history(self):
+        self.states = self.db.delivery_states(self.device.ip)
         messages = self.db.load_messages(self.device.ip)
-        for direction, msg in messages:
-            self.add_text_bubble(msg, direction == "sent")
+        for direction, msg, uid in messages:
+            self.add_text_bubble(msg, direction == "sent", uid)
+
+    def refresh_delivery(self):
+        # Called by MainWindow when the outbox delivers or gives up
+        self.states = self.db.delivery_states(self.device.ip)
+        self.chat_view.clear()
+        for kind, content, sent, uid in self.bubbles:
+            if kind == "file":
+                self.draw_file_bubble(*content, sent, self.states.get(uid))
+            else:
+                self.draw_text_bubble(content, sent, self.states.get(uid))
 
     # -------------------------
     # Text messaging
@@ -78,13 +93,16 @@ class ChatWindow(QWidget):
         if not msg:
             return
 
-        sender = SendMessageThread(self.device.ip, msg)
-        self.send_threads.append(sender)
-        sender.finished.connect(lambda: self.send_threads.remove(sender))
-        sender.start()
+        if encoded_size(msg) > MAX_MESSAGE_BYTES:
+            QMessageBox.warning(self, "Message too long", "Please split it into smaller messages.")
+            return
 
-        self.db.save_message(self.device.ip, "sent", msg)
-        self.add_text_bubble(msg, sent=True)
+        message_id = self.db.save_message(self.device.ip, "sent", msg)
+        uid = self.db.enqueue_message(self.device.ip, msg, message_id=message_id)
+        self.states[uid] = "queued"
+        self.main_window.get_outbox().flush()
+
+        self.add_text_bubble(msg, sent=True, uid=uid)
         self.input.clear()
 
     def receive(self, msg):
@@ -114,20 +132,19 @@ class ChatWindow(QWidget):
             return
 
         path = Path(file_path)
-        self.main_window.file_server.add_file(path)
+        self.main_window.get_file_server().add_file(path)
         meta = {
             "type": "file",
             "filename": path.name,
             "filesize": path.stat().st_size
         }
 
-        sender = SendMessageThread(self.device.ip, json.dumps(meta))
-        self.send_threads.append(sender)
-        sender.finished.connect(lambda: self.send_threads.remove(sender))
-        sender.start()
+        uid = self.db.enqueue_message(self.device.ip, json.dumps(meta), filename=path.name)
+        self.states[uid] = "queued"
+        self.main_window.get_outbox().flush()
 
         self.pending_files[path.name] = path
-        self.add_file_bubble(path.name, path.stat().st_size, sent=True)
+        self.add_file_bubble(path.name, path.stat().st_size, sent=True, uid=uid)
 
     # -------------------------
     # File download handling
@@ -145,7 +162,7 @@ class ChatWindow(QWidget):
             return
 
         sender = FileSender(
-            self.device.ip,
+            list(self.device.addresses),
             filename,
             save_path
         )
@@ -156,7 +173,24 @@ class ChatWindow(QWidget):
     # -------------------------
     # UI bubbles
     # -------------------------
-    def add_text_bubble(self, text, sent):
+    def add_text_bubble(self, text, sent, uid=None):
+        self.bubbles.append(("text", text, sent, uid))
+        self.draw_text_bubble(text, sent, self.states.get(uid))
+
+    def add_file_bubble(self, filename, size, sent, uid=None):
+        self.bubbles.append(("file", (filename, size), sent, uid))
+        self.draw_file_bubble(filename, size, sent, self.states.get(uid))
+
+    def status_line(self, state):
+        if state == "queued":
+            label = f"⏳ Waiting for {self.device.name}"
+        elif state == "failed":
+            label = "⚠ Not delivered"
+        else:
+            return ""
+        return f'<div style="margin-top:4px; font-size:12px; opacity:0.8;">{label}</div>'
+
+    def draw_text_bubble(self, text, sent, state=None):
         align = "right" if sent else "left"
         bg = "#1e88e5" if sent else "#2a2a2a"
         radius = "12px 12px 4px 12px" if sent else "12px 12px 12px 4px"
@@ -177,12 +211,13 @@ class ChatWindow(QWidget):
                 font-size:15px;
             ">
                 {text}
+                {self.status_line(state)}
             </div>
         </div>
         """)
 
 
-    def add_file_bubble(self, filename, size, sent):
+    def draw_file_bubble(self, filename, size, sent, state=None):
         bg = "#1e88e5" if sent else "#2a2a2a"
         radius = "12px 12px 4px 12px" if sent else "12px 12px 12px 4px"
         justify = "flex-end" if sent else "flex-start"
@@ -217,6 +252,7 @@ class ChatWindow(QWidget):
                 📎 <b>{filename}</b><br>
                 <span style="opacity:0.8;">{size // 1024} KB</span>
                 {action}
+                {self.status_line(state)}
             </div>
         </div>
         """)
@@ -7,12 +7,10 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QTimer
 
 from models.device import Device
-from ui.chat_window import ChatWindow
 
-from network.discovery import DiscoveryThread
-
-from network.tcp_server import TCPServer
-from network.file_server import FileServer
+# Chat windows, network services and storage are imported on first use
+# (see start_network / get_file_server / get_outbox / new_chat_window)
+# so the window can paint before any of them load.
 
 
 class MainWindow(QMainWindow):
@@ -42,10 +40,31 @@ class MainWindow(QMainWindow):
         self.layout.addLayout(self.grid)
 
         # ---------- DATA ----------
-        self.devices = {}
+        self.devices = {}  # every known address -> Device
+        self.peers = {}    # discovery id -> Device
         self.chat_windows = {}
 
+        # UI refresh timer
+        self.refresh_timer = QTimer()
+        self.refresh_timer.timeout.connect(self.refresh_status)
+        self.refresh_timer.start(2000)
+
         # ---------- NETWORK ----------
+        # Started from the first showEvent, see start_network
+        self.network_started = False
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Queued behind the first paint, but doesn't need one to happen
+        # (a minimized window or a non-painting platform plugin)
+        if not self.network_started:
+            self.network_started = True
+            QTimer.singleShot(0, self.start_network)
+
+    def start_network(self):
+        from network.discovery import DiscoveryThread
+        from network.tcp_server import TCPServer
+
         self.my_name = socket.gethostname()
         print("My device name:", self.my_name)
 
@@ -54,19 +73,49 @@ class MainWindow(QMainWindow):
         self.tcp_server.message_received.connect(self.on_message_received)
         self.tcp_server.start()
 
-        # FILE SERVER (FIXED)
-        self.file_server = FileServer()
-        self.file_server.start()
-
         # UDP DISCOVERY
         self.discovery = DiscoveryThread(self.my_name)
         self.discovery.device_found.connect(self.add_device)
         self.discovery.start()
 
-        # UI refresh timer
-        self.refresh_timer = QTimer()
-        self.refresh_timer.timeout.connect(self.refresh_status)
-        self.refresh_timer.start(2000)
+    # ---------- LAZY SERVICES ----------
+    def get_file_server(self):
+        # Only needed once we share a file
+        if not hasattr(self, "file_server"):
+            from network.file_server import FileServer
+
+            self.file_server = FileServer()
+            self.file_server.start()
+        return self.file_server
+
+    def is_file_shared(self, filename):
+        return hasattr(self, "file_server") and filename in self.file_server.shared_files
+
+    def get_outbox(self):
+        # First message sent or first peer seen opens the SQLite outbox
+        if not hasattr(self, "outbox"):
+            from network.message_queue import MessageQueue
+
+            self.outbox = MessageQueue(self.is_file_shared)
+            self.outbox.delivery_changed.connect(self.on_delivery_changed)
+            self.outbox.start()
+        return self.outbox
+
+    def get_db(self):
+        if not hasattr(self, "db"):
+            from storage.chat_db import ChatDB
+
+            self.db = ChatDB()
+        return self.db
+
+    def new_chat_window(self, device):
+        from ui.chat_window import ChatWindow
+
+        chat = ChatWindow(device, self)
+        chat.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose, False)
+        chat.show()
+        self.chat_windows[device.ip] = chat
+        return chat
 
     # ---------- UI HELPERS ----------
     def refresh_status(self):
@@ -82,13 +131,26 @@ class MainWindow(QMainWindow):
         if not name or not ip:
             return
 
-        if ip in self.devices:
+        # A peer beacons on each of its interfaces; keep them on one device
+        peer_id = data.get("id", name)
+        device = self.peers.get(peer_id) or self.devices.get(ip)
+
+        if device is not None:
+            self.peers[peer_id] = device
+            if device.add_address(ip):
+                print(f"{device.name} also reachable at {ip}")
+                self.devices[ip] = device
+                self.choose_primary(device)
+            # Anything queued for this peer can go out now
+            self.get_outbox().peer_seen(device.ip, device.addresses)
             return
 
         print(f"UI adding device: {name} ({ip})")
 
         device = Device(name, ip, 6000)
         self.devices[ip] = device
+        self.peers[peer_id] = device
+        self.get_outbox().peer_seen(device.ip, device.addresses)
 
         btn = QLabel(f"💻 {name}")
         btn.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -105,9 +167,9 @@ class MainWindow(QMainWindow):
         """)
         btn.mousePressEvent = lambda e, d=device: self.open_chat(d)
 
-        row = (len(self.devices) - 1) // 4
-        col = (len(self.devices) - 1) % 4
-        self.grid.addWidget(btn, row, col)
+        # peers also holds ids of restarted devices, count tiles instead
+        slot = self.grid.count()
+        self.grid.addWidget(btn, slot // 4, slot % 4)
 
 
 
@@ -121,26 +183,46 @@ class MainWindow(QMainWindow):
             chat.activateWindow()
             return
 
-        chat = ChatWindow(device, self)
-        chat.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose, False)
-        chat.show()
-        self.chat_windows[ip] = chat
+        self.new_chat_window(device)
+
+
+    def choose_primary(self, device):
+        """
+        device.ip keys chat history, chat windows and the outbox, so it
+        must not depend on which beacon arrived first. An address that
+        already has history wins and stays; otherwise the most stable
+        kind of address is picked.
+        """
+        from network.routing import address_preference
+
+        # Never re-key a conversation that is on screen
+        if device.ip in self.chat_windows or self.get_db().has_history(device.ip):
+            return
+
+        with_history = [a for a in device.addresses if self.get_db().has_history(a)]
+        best = min(with_history or device.addresses, key=address_preference)
+        if best != device.ip:
+            print(f"{device.name}: using {best} instead of {device.ip}")
+            device.set_primary(best)
 
 
     # ---------- MESSAGE ROUTING ----------
     def on_message_received(self, ip, message):
         device = self.devices.get(ip, Device(ip, ip, 6000))
+        ip = device.ip
 
         if ip not in self.chat_windows:
-            chat = ChatWindow(device, self)
-            chat.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose, False)
-            chat.show()
-            self.chat_windows[ip] = chat
+            self.new_chat_window(device)
 
         self.chat_windows[ip].receive(message)
 
 
 
+    def on_delivery_changed(self, ip):
+        if ip in self.chat_windows:
+            self.chat_windows[ip].refresh_delivery()
+
+
     # ---------- CLEAN SHUTDOWN ----------
     def closeEvent(self, event):
         print("Closing application...")
@@ -161,6 +243,13 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 print("TCP shutdown error:", e)
 
+        # ---- Stop outbox ----
+        if hasattr(self, "outbox"):
+            try:
+                self.outbox.shutdown()
+            except Exception as e:
+                print("Outbox shutdown error:", e)
+
         # ---- Stop File server ----
         if hasattr(self, "file_server"):
             try:
@@ -0,0 +1,97 @@
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+
+class StartupProfiler:
+    """
+    Times every module import (like ``python -X importtime``) and the
+    first paint of the main window.
+
+    The startup report is printed at first paint; modules loaded lazily
+    after that are logged as they come in.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.imports = []  # (module, self ms, cumulative ms)
+        self.import_total = 0.0
+        self.lock = threading.Lock()
+
+        # Worker threads import too; each needs its own nesting stack
+        self.local = threading.local()
+        self.painted = False
+        self.original_import = builtins.__import__
+
+    def install(self):
+        builtins.__import__ = self._import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module = name
+        if level:
+            try:
+                package = (globals or {}).get("__package__")
+                module = importlib.util.resolve_name("." * level + name, package)
+            except (ImportError, ValueError):
+                pass
+
+        if module in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        # "a.b.c" loads its parent packages first; credit the first new one
+        parts = module.split(".")
+        for i in range(1, len(parts)):
+            if ".".join(parts[:i]) not in sys.modules:
+                module = ".".join(parts[:i])
+                break
+
+        # Child time accumulated per active import, for this thread
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        stack = self.local.stack
+        stack.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = (time.perf_counter() - t0) * 1000
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+
+            with self.lock:
+                if not stack:
+                    self.import_total += elapsed
+                self.imports.append((module, elapsed - children, elapsed))
+
+            if self.painted and not stack:
+                print(f"[startup] lazy import {module}: {elapsed:.1f} ms")
+
+    def watch_first_paint(self, window):
+        from PyQt6.QtCore import QObject, QEvent
+
+        profiler = self
+
+        class PaintWatcher(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Type.Paint and not profiler.painted:
+                    profiler.first_paint()
+                    obj.removeEventFilter(self)
+                return False
+
+        self.watcher = PaintWatcher()
+        window.installEventFilter(self.watcher)
+
+    def first_paint(self):
+        self.painted = True
+        total = (time.perf_counter() - self.start) * 1000
+
+        print("[startup] imports, slowest first (self ms | cumulative ms | module):")
+        with self.lock:
+            ranked = sorted(self.imports, key=lambda item: item[2], reverse=True)
+        for module, own, cumulative in ranked:
+            print(f"[startup] {own:9.1f} | {cumulative:9.1f} | {module}")
+
+        print(f"[startup] {len(self.imports)} modules, {self.import_total:.1f} ms importing (all threads)")
+        print(f"[startup] time to first paint: {total:.1f} ms")